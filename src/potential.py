@@ -1,12 +1,27 @@
+import math
+from functools import lru_cache
 import numpy as np
 import matplotlib.pyplot as plt
 
+try:
+    from numba import njit, prange  # Optionnel : compilation JIT du noyau
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    import cupy as cp  # Optionnel : calcul du potentiel sur GPU
+    HAS_CUPY = True
+except ImportError:
+    HAS_CUPY = False
+
 # === CONFIGURATION GÉNÉRALE ===
 unit = "eV"         # Unité d'énergie : "eV" ou "J"
 test_mode = True    # Mode test (rapide) ou haute précision
 sectionA = 3         # Section A à exécuter
 sectionB = 1         # Section B à exécuter
 sectionC = 0         # Section C à exécuter
+use_gpu = False      # Calcul du potentiel sur GPU (nécessite CuPy)
 
 # === CONSTANTES PHYSIQUES ===
 epsilon_0 = 8.854187817e-12     # Permittivité du vide (F/m)
@@ -24,7 +39,8 @@ voisinage = 1                   # Nombre de voisins considérés : 1 dans l'éno
 # === GRILLE NUMÉRIQUE ===
 x_points = 400 if test_mode else 4000  # Nombre de points sur la grille
 n_marches = 100 if test_mode else 500  # Nombre de marches discrètes
-x = np.linspace(0, (N + 1) * L, x_points)  # Grille de positions
+dtype = np.float32                     # Précision de la grille (affichage et discrétisation)
+x = np.linspace(0, (N + 1) * L, x_points, dtype=dtype)  # Grille de positions
 
 # === CONVERSIONS ===
 def convert_energy(val):
@@ -38,36 +54,151 @@ def convert_energy(val):
     else:
         raise ValueError("Unité non supportée : 'eV' ou 'J'")
 
+_ENERGY_FACTOR = convert_energy(1.0)  # Facteur eV → unité choisie, résolu une seule fois
+
+# === INVARIANTS PRÉCALCULÉS ===
+_XJ = (np.arange(N) + 1) * L    # Positions des charges
+_XJ_BY_DTYPE = {np.dtype(dtype): _XJ.astype(dtype)}  # Copies par précision flottante
+_C = -e * k                     # Coefficient coulombien par charge unité (eV·m) : e²k/e = e·k
+_CONST = _C * _ENERGY_FACTOR    # Même coefficient dans l'unité choisie
+
+def charge_positions(N=N, L=L, dtype=np.float64):
+    """
+    Retourne les positions des charges dans la précision dtype,
+    précalculées pour la configuration par défaut.
+    """
+    dtype = np.dtype(dtype)
+    if N == _XJ.size and L == _XJ[0]:
+        if dtype not in _XJ_BY_DTYPE:
+            _XJ_BY_DTYPE[dtype] = _XJ.astype(dtype)
+        return _XJ_BY_DTYPE[dtype]
+    return ((np.arange(N) + 1) * L).astype(dtype, copy=False)
+
 # === POTENTIEL COULOMBIEN ADOUCI ===
-def coulomb_softened(x, x0, Q, a):
+def neighbor_table(x, L=L, N=N, voisinage=voisinage):
     """
-    Calcule le potentiel de Coulomb adouci.
+    Table (points, 2*voisinage+1) des indices des charges voisines de chaque point.
+    Les indices hors bornes pointent vers une charge fantôme d'indice N.
     """
-    r = np.sqrt((x - x0)**2 + a**2)  # Distance adoucie
-    V = - Q * e**2 * k / r          # Potentiel de Coulomb
-    return V / e  # Retourne en eV
+    j_c = np.clip(np.floor(x / L - 0.5).astype(int), 0, N - 1)  # Charge centrale
+    neigh = j_c[:, None] + np.arange(-voisinage, voisinage + 1)[None, :]
+    return np.where((neigh >= 0) & (neigh < N), neigh, N).astype(np.int32)
 
-def V_total(x, Q=Q, a=a, L=L, N=N, voisinage=voisinage):
+def softened_inverse(d, a2, xp=np):
     """
-    Calcule le potentiel total en sommant les contributions des charges voisines.
+    Transforme en place un tampon de différences (points, k) en 1/r adoucis.
+    xp : module de tableaux (np, ou cp pour un tampon sur GPU).
     """
-    V = 0
-    j_c = int(np.floor(x / L - 0.5))  # Index de la charge centrale
-    j_c = max(0, min(N - 1, j_c))    # Limite l'index aux bornes
-    for j in range(j_c - voisinage, j_c + voisinage + 1):
-        if 0 <= j < N:
-            xj = (j + 1) * L
-            V += coulomb_softened(x, xj, Q, a)
-    return V
+    d *= d
+    d += a2
+    xp.sqrt(d, out=d)
+    xp.reciprocal(d, out=d)
+    return d
 
-# === CALCUL DU POTENTIEL CONTINU SUR LA GRILLE ===
-V = np.array([V_total(xi) for xi in x])  # Potentiel continu
-V[0] = 0.0  # Condition aux bords
-V[-1] = 0.0
-V_converted = convert_energy(V)  # Conversion en unité choisie
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def V_grid(x, xj, L, a2, N, voisinage, const):
+        """
+        Noyau compilé : potentiel total en chaque point de x (boucle parallèle).
+        """
+        out = np.empty_like(x)
+        for i in prange(x.shape[0]):
+            xi = x[i]
+            j_c = int(xi / L - 0.5)  # Index de la charge centrale
+            j_c = 0 if j_c < 0 else (N - 1 if j_c >= N else j_c)
+            s = 0.0
+            for j in range(max(0, j_c - voisinage), min(N, j_c + voisinage + 1)):
+                dx = xi - xj[j]
+                s += 1.0 / math.sqrt(dx * dx + a2)
+            out[i] = s * const
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def V_grid_fixed(x, xj, L, a2, N, voisinage, const):
+        """
+        Noyau compilé : la boucle interne fait toujours 2*voisinage+1 itérations,
+        les voisins hors bornes étant pondérés par 0 au lieu d'être sautés.
+        La largeur n'est pas spécialisée à la compilation (voisinage est un argument).
+        """
+        out = np.empty_like(x)
+        W = 2 * voisinage + 1
+        for i in prange(x.shape[0]):
+            xi = x[i]
+            j_c = int(xi / L - 0.5)  # Index de la charge centrale
+            j_c = 0 if j_c < 0 else (N - 1 if j_c >= N else j_c)
+            s = 0.0
+            for w in range(W):
+                j = j_c - voisinage + w
+                valid = 1.0 if 0 <= j < N else 0.0   # Sélection sans branchement
+                j = 0 if j < 0 else (N - 1 if j >= N else j)
+                dx = xi - xj[j]
+                s += valid / math.sqrt(dx * dx + a2)
+            out[i] = s * const
+        return out
+
+def V_grid_gpu(x, xj, a2, neigh, const):
+    """
+    Potentiel total calculé sur GPU avec CuPy.
+    neigh : table des charges voisines (charge fantôme incluse), ou None pour toutes.
+    """
+    x_gpu = cp.asarray(x)
+    if neigh is None:
+        xj_gpu = cp.asarray(xj)[None, :]
+    else:
+        xj_gpu = cp.asarray(np.append(xj, np.inf).astype(x.dtype))[cp.asarray(neigh)]
+    inv_r = softened_inverse(x_gpu[:, None] - xj_gpu, a2, xp=cp)
+    return cp.asnumpy(const * inv_r.sum(axis=1, dtype=cp.float64))
+
+def V_total(x, Q=Q, a=a, L=L, N=N, voisinage=voisinage, use_gpu=use_gpu):
+    """
+    Calcule le potentiel total en sommant les contributions des charges voisines,
+    directement dans l'unité d'énergie choisie.
+    Vectorisé : x peut être un scalaire ou un tableau de positions.
+    Le calcul est fait dans la précision flottante de x (float32 ou float64),
+    sur GPU si use_gpu est vrai et que CuPy est disponible.
+    """
+    x = np.asarray(x)
+    if not np.issubdtype(x.dtype, np.floating):
+        x = x.astype(np.float64)
+    x_flat = np.atleast_1d(x)
+    xj = charge_positions(N, L, x.dtype)  # Positions des charges
+    a2 = x.dtype.type(a * a)  # Adoucissement au carré, calculé une seule fois
+    if use_gpu and HAS_CUPY:
+        neigh = neighbor_table(x_flat, L, N, voisinage) if voisinage < N - 1 else None
+        V = V_grid_gpu(x_flat, xj, a2, neigh, Q * _CONST)
+        return V.astype(x.dtype, copy=False).reshape(x.shape)
+    if HAS_NUMBA:
+        const = x.dtype.type(Q * _CONST)
+        if voisinage < N - 1:
+            V = V_grid_fixed(x_flat, xj, x.dtype.type(L), a2, N, voisinage, const)
+        else:
+            V = V_grid(x_flat, xj, x.dtype.type(L), a2, N, voisinage, const)
+        return V.reshape(x.shape)
+
+    if voisinage < N - 1:
+        xj_ext = np.append(xj, np.inf).astype(x.dtype)  # Charge fantôme à l'infini : 1/r = 0
+        d = x_flat[:, None] - xj_ext[neighbor_table(x_flat, L, N, voisinage)]
+    else:
+        d = x_flat[:, None] - xj[None, :]  # Toutes les charges contribuent
 
-# Affichage des valeurs minimales et maximales du potentiel
-print(f"V_min = {np.min(V_converted):.3e} {unit}, V_max = {np.max(V_converted):.3e} {unit}")
+    inv_r = softened_inverse(d, a2)  # 1/r adouci, calculé en place dans un seul tampon
+    V = inv_r.sum(axis=1, dtype=np.float64)  # Accumulation en double précision
+    V *= Q * _CONST
+    return V.astype(x.dtype, copy=False).reshape(x.shape)
+
+# === CALCUL DU POTENTIEL CONTINU SUR LA GRILLE ===
+@lru_cache(maxsize=None)
+def compute_V(Q=Q, a=a, L=L, N=N, voisinage=voisinage, x_points=x_points):
+    """
+    Calcule le potentiel continu (bords à 0) sur une grille de x_points points.
+    Le résultat est mémorisé pour chaque jeu de paramètres.
+    """
+    x_grid = np.linspace(0, (N + 1) * L, x_points, dtype=dtype)
+    V = V_total(x_grid, Q=Q, a=a, L=L, N=N, voisinage=voisinage)
+    V[0] = 0.0  # Condition aux bords
+    V[-1] = 0.0
+    V.flags.writeable = False  # Tableau partagé par le cache
+    return V
 
 # === DISCRÉTISATION DU POTENTIEL ===
 def discretize_potential_with_boundaries(x, V_continuous, n):
@@ -79,18 +210,17 @@ def discretize_potential_with_boundaries(x, V_continuous, n):
     x_edges = np.linspace(x[0], x[-1], n_total + 1)  # Bords des marches
     x_centers = (x_edges[:-1] + x_edges[1:]) / 2     # Centres des marches
 
-    V_discrete = []
-    for i in range(n_total):
-        x_start = x_edges[i]
-        x_end = x_edges[i + 1]
-        mask = (x >= x_start) & (x < x_end)
-        if i == 0 or i == n_total - 1:
-            V_discrete.append(0.0)  # Conditions aux bords
-        else:
-            V_avg = np.mean(V_continuous[mask])  # Moyenne sur la marche
-            V_discrete.append(V_avg)
+    # Premier point de chaque marche (x trié, uniforme ou non)
+    starts = np.searchsorted(x, x_edges[:-1], side='left')
+    counts = np.diff(np.append(starts, V_continuous.size))
+
+    # Moyenne sur chaque marche en une seule passe ; les marches vides valent 0
+    sums = np.add.reduceat(V_continuous, np.minimum(starts, V_continuous.size - 1), dtype=np.float64)
+    V_discrete = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+    V_discrete[0] = 0.0   # Conditions aux bords
+    V_discrete[-1] = 0.0
 
-    return x_centers, np.array(V_discrete), x_edges
+    return x_centers, V_discrete, x_edges
 
 # === CONSTRUCTION DE LA FONCTION DISCRÈTE ===
 def V_discret_function(x_vals, x_edges, V_vals):
@@ -102,50 +232,51 @@ def V_discret_function(x_vals, x_edges, V_vals):
     indices = np.clip(indices, 0, len(V_vals) - 1)  # Évite les dépassements
     return V_vals[indices]
 
-# === APPEL DE LA DISCRÉTISATION ===
-x_marches, V_marches, x_edges = discretize_potential_with_boundaries(x, V_converted, n_marches)
-
-# === CONSTRUCTION DE LA VERSION FONCTIONNELLE PAR MORCEAUX ===
-x_fine = np.linspace(x[0], x[-1], 5000)  # Grille fine pour affichage
-V_piecewise = V_discret_function(x_fine, x_edges, V_marches)
-
-# === PLOT ===
-if sectionA == 3 or sectionB == 3 or sectionC == 3:
-    # === AFFICHAGE DU POTENTIEL CONTINU VS DISCRET ===
-    plt.figure()
-    plt.plot(x, V_converted, color='blue', label="Potentiel continu")
-    plt.plot(x_fine, V_piecewise, color='red', label="Potentiel discrétisé")
-    plt.xlabel("Position [a.u.]")
-    plt.ylabel(f"Énergie potentielle [{unit}]")
-    plt.grid(True)
-    plt.legend(loc='best', fontsize='large')
-
-    if test_mode:
-        plt.show()
-    else:
-        plt.savefig("pot_discretisation.pdf")
-
-if sectionA == 1 or sectionB == 1 or sectionC == 1:
-    # === COMPARAISON AVEC DIFFÉRENTS VOISINAGES ===
-    plt.figure(figsize=(8, 6))
-
-    # Potentiel avec N voisins
-    plt.plot(x, V_converted, label="Potentiel continu (N voisins)", color='blue')
-
-    # Potentiel avec 1 voisin
-    voisinage = 1 
-    V_1_voisin = np.array([V_total(xi, Q=Q, a=a, L=L, N=N, voisinage=voisinage) for xi in x])
-    V_1_voisin_converted = convert_energy(V_1_voisin)
-    plt.plot(x, V_1_voisin_converted, label="Potentiel continu (1 voisin)", color='red')
-
-    # Configuration du graphe
-    plt.xlabel("Position [a.u.]")
-    plt.ylabel(f"Énergie potentielle [{unit}]")
-    plt.grid(True)
-    plt.legend(loc='best', fontsize='large')
-
-    # Affichage ou sauvegarde
-    if test_mode:
-        plt.show()
-    else:
-        plt.savefig("pot_comparaison_N_et_1_voisin_sur_meme_graphe.pdf")
+if __name__ == "__main__":
+    V_converted = compute_V()  # Potentiel continu, déjà dans l'unité choisie
+
+    # Affichage des valeurs minimales et maximales du potentiel
+    print(f"V_min = {np.min(V_converted):.3e} {unit}, V_max = {np.max(V_converted):.3e} {unit}")
+
+    # === APPEL DE LA DISCRÉTISATION ===
+    x_marches, V_marches, x_edges = discretize_potential_with_boundaries(x, V_converted, n_marches)
+
+    # === PLOT ===
+    if sectionA == 3 or sectionB == 3 or sectionC == 3:
+        # === AFFICHAGE DU POTENTIEL CONTINU VS DISCRET ===
+        plt.figure()
+        plt.plot(x, V_converted, color='blue', label="Potentiel continu")
+        plt.step(x_marches, V_marches, where='mid', color='red', label="Potentiel discrétisé")
+        plt.xlabel("Position [a.u.]")
+        plt.ylabel(f"Énergie potentielle [{unit}]")
+        plt.grid(True)
+        plt.legend(loc='best', fontsize='large')
+
+        if test_mode:
+            plt.show()
+        else:
+            plt.savefig("pot_discretisation.pdf")
+
+    if sectionA == 1 or sectionB == 1 or sectionC == 1:
+        # === COMPARAISON AVEC DIFFÉRENTS VOISINAGES ===
+        plt.figure(figsize=(8, 6))
+
+        # Potentiels avec N voisins et avec 1 voisin
+        V_N_voisins = V_total(x, voisinage=N - 1)  # Toutes les charges contribuent
+        V_1_voisin = V_total(x, voisinage=1)
+        V_N_voisins[0] = 0.0  # Condition aux bords
+        V_N_voisins[-1] = 0.0
+        plt.plot(x, V_N_voisins, label="Potentiel continu (N voisins)", color='blue')
+        plt.plot(x, V_1_voisin, label="Potentiel continu (1 voisin)", color='red')
+
+        # Configuration du graphe
+        plt.xlabel("Position [a.u.]")
+        plt.ylabel(f"Énergie potentielle [{unit}]")
+        plt.grid(True)
+        plt.legend(loc='best', fontsize='large')
+
+        # Affichage ou sauvegarde
+        if test_mode:
+            plt.show()
+        else:
+            plt.savefig("pot_comparaison_N_et_1_voisin_sur_meme_graphe.pdf")